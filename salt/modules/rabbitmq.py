@@ -123,6 +123,13 @@ def _get_rabbitmq_plugin():
     return RABBITMQ_PLUGINS
 
 
+def _erlang_binary(value):
+    """
+    Quote a string as a UTF-8 Erlang binary for use with rabbitmqctl eval.
+    """
+    return '<<"{}"/utf8>>'.format(value.replace("\\", "\\\\").replace('"', '\\"'))
+
+
 def _safe_output(line):
     """
     Looks for rabbitmqctl warning, or general formatting, strings that aren't
@@ -648,6 +655,45 @@ def set_permissions(vhost, user, conf=".*", write=".*", read=".*", runas=None):
     return _format_response(res, msg)
 
 
+def set_permissions_bulk(user, perms, runas=None):
+    """
+    .. versionadded:: 3008.0
+
+    Sets permissions for several vhosts with a single rabbitmqctl eval call.
+    ``perms`` is a list of ``(vhost, conf, write, read)`` tuples. Requires
+    RabbitMQ 3.7.0 or later.
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt '*' rabbitmq.set_permissions_bulk myuser "[['/', '.*', '.*', '.*']]"
+    """
+    if runas is None and not salt.utils.platform.is_windows():
+        runas = salt.utils.user.get_user()
+
+    perms_list = ", ".join(
+        "{{{}}}".format(", ".join(_erlang_binary(item) for item in perm))
+        for perm in perms
+    )
+    cmd = (
+        "lists:foreach(fun({{V, C, W, R}}) -> "
+        "rabbit_auth_backend_internal:set_permissions"
+        '({}, V, C, W, R, <<"rmq-cli">>) end, [{}]).'.format(
+            _erlang_binary(user), perms_list
+        )
+    )
+
+    res = __salt__["cmd.run_all"](
+        [RABBITMQCTL, "eval", cmd],
+        reset_system_locale=False,
+        runas=runas,
+        python_shell=False,
+    )
+    msg = "Permissions Set"
+    return _format_response(res, msg)
+
+
 def list_permissions(vhost, runas=None):
     """
     Lists permissions for vhost via rabbitmqctl list_permissions
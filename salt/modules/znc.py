@@ -6,49 +6,65 @@ znc - An advanced IRC bouncer
 Provides an interface to basic ZNC functionality
 """
 
-import hashlib
 import logging
 import os.path
-import random
 import signal
 
 import salt.utils.path
+from salt.exceptions import CommandExecutionError
 
 log = logging.getLogger(__name__)
 
+# Define the module's virtual name
+__virtualname__ = "znc"
+
+_HASHERS = frozenset(("sha256", "md5"))
+
 
 def __virtual__():
     """
     Only load the module if znc is installed
     """
     if salt.utils.path.which("znc"):
-        return "znc"
+        return __virtualname__
     return (False, "Module znc: znc binary not found")
 
 
 def _makepass(password, hasher="sha256"):
     """
     Create a znc compatible hashed password
+
+    Passing ``hasher="Argon2id"`` (supported by ZNC 1.9.0 and later) uses the
+    ``argon2-cffi`` python library with ZNC's own cost parameters instead of
+    a single salted digest. The salt is embedded in the encoded hash.
     """
-    # Setup the hasher
-    if hasher == "sha256":
-        h = hashlib.sha256(password)
-    elif hasher == "md5":
-        h = hashlib.md5(password)
-    else:
+    if hasher == "Argon2id":
+        try:
+            from argon2 import PasswordHasher, Type
+        except ImportError:
+            raise CommandExecutionError(
+                "The argon2-cffi python library is required to use the "
+                "Argon2id hasher"
+            )
+        ph = PasswordHasher(
+            time_cost=6, memory_cost=6144, parallelism=1, hash_len=32, type=Type.ID
+        )
+        return {"Method": "Argon2id", "Salt": "", "Hash": ph.hash(password)}
+
+    # Only needed here, so keep them out of the module import cost
+    import hashlib
+    import secrets
+
+    if hasher not in _HASHERS:
         return NotImplemented
 
     c = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!?.,:;/*-+_()"
-    r = {
-        "Method": h.name,
-        "Salt": "".join(random.SystemRandom().choice(c) for x in range(20)),
-    }
+    pass_salt = "".join([secrets.choice(c) for x in range(20)])
 
     # Salt the password hash
-    h.update(r["Salt"])
-    r["Hash"] = h.hexdigest()
+    digest = hashlib.new(hasher, (password + pass_salt).encode()).hexdigest()
 
-    return r
+    return {"Method": hasher, "Salt": pass_salt, "Hash": digest}
 
 
 def buildmod(*modules):
@@ -64,7 +80,7 @@ def buildmod(*modules):
     # Check if module files are missing
     missing = [module for module in modules if not os.path.exists(module)]
     if missing:
-        return "Error: The file ({}) does not exist.".format(", ".join(missing))
+        return f"Error: The file ({', '.join(missing)}) does not exist."
 
     cmd = ["znc-buildmod"]
     cmd.extend(modules)
@@ -108,7 +124,8 @@ def version():
 
         salt '*' znc.version
     """
-    cmd = ["znc", "--version"]
-    out = __salt__["cmd.run"](cmd, python_shell=False).splitlines()
-    ret = out[0].split(" - ")
-    return ret[0]
+    if "znc.version" not in __context__:
+        cmd = ["znc", "--version"]
+        out = __salt__["cmd.run"](cmd, python_shell=False)
+        __context__["znc.version"] = out.partition("\n")[0].partition(" - ")[0]
+    return __context__["znc.version"]
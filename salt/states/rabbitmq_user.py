@@ -19,12 +19,19 @@ Example:
             - '.*'
             - '.*'
         - runas: rabbitmq
-"""
 
+Permissions are set for all vhosts at once through ``rabbitmqctl eval``,
+which needs RabbitMQ 3.7.0 or later. If that call fails, for example on an
+older RabbitMQ or on a node where ``eval`` is restricted, the state falls
+back to one ``rabbitmqctl set_permissions`` call per vhost for the rest of
+the run. On Windows, where ``cmd.exe`` quoting breaks the ``eval`` expression,
+permissions are always set per vhost.
+"""
 
 import logging
 
 import salt.utils.path
+import salt.utils.platform
 from salt.exceptions import CommandExecutionError
 
 log = logging.getLogger(__name__)
@@ -39,6 +46,50 @@ def __virtual__():
     return (False, "Command not found: rabbitmqctl")
 
 
+def _list_users(runas=None):
+    """
+    Return rabbitmq.list_users, cached in __context__ for the state run
+    """
+    cache = __context__.setdefault("rabbitmq_user.list_users", {})
+    if runas not in cache:
+        cache[runas] = __salt__["rabbitmq.list_users"](runas=runas)
+    return cache[runas]
+
+
+def _clear_cache():
+    """
+    Drop the cached rabbitmqctl user listing after users or tags change
+    """
+    __context__.pop("rabbitmq_user.list_users", None)
+
+
+def _set_permissions(name, perms, runas=None):
+    """
+    Set a list of ``(vhost, conf, write, read)`` permissions for the user,
+    falling back to one rabbitmqctl call per vhost if the bulk call fails
+    """
+    if not (
+        salt.utils.platform.is_windows()
+        or __context__.get("rabbitmq_user.bulk_unavailable")
+    ):
+        try:
+            __salt__["rabbitmq.set_permissions_bulk"](name, perms, runas=runas)
+            return
+        except CommandExecutionError as err:
+            # Don't retry the bulk call for every user in this run
+            __context__["rabbitmq_user.bulk_unavailable"] = True
+            log.warning(
+                "Bulk permission update for %s failed, setting permissions "
+                "per vhost for the rest of this run: %s",
+                name,
+                err,
+            )
+    for vhost, conf, write, read in perms:
+        __salt__["rabbitmq.set_permissions"](
+            vhost, name, conf, write, read, runas=runas
+        )
+
+
 def _check_perms_changes(name, newperms, runas=None, existing=None):
     """
     Check whether Rabbitmq user's permissions need to be changed.
@@ -54,31 +105,29 @@ def _check_perms_changes(name, newperms, runas=None, existing=None):
             return False
 
     empty_perms = {"configure": "", "write": "", "read": ""}
-    perm_need_change = False
     for vhost_perms in newperms:
         for vhost, perms in vhost_perms.items():
-            if vhost in existing:
-                new_perms = {"configure": perms[0], "write": perms[1], "read": perms[2]}
-                existing_vhost = existing[vhost]
-                if new_perms != existing_vhost:
-                    # This checks for setting permissions to nothing in the state,
-                    # when previous state runs have already set permissions to
-                    # nothing. We don't want to report a change in this case.
-                    if existing_vhost == empty_perms and perms == empty_perms:
-                        continue
-                    perm_need_change = True
-            else:
-                perm_need_change = True
+            if vhost not in existing:
+                return True
+            new_perms = {"configure": perms[0], "write": perms[1], "read": perms[2]}
+            existing_vhost = existing[vhost]
+            if new_perms != existing_vhost:
+                # This checks for setting permissions to nothing in the state,
+                # when previous state runs have already set permissions to
+                # nothing. We don't want to report a change in this case.
+                if existing_vhost == empty_perms and new_perms == empty_perms:
+                    continue
+                return True
 
-    return perm_need_change
+    return False
 
 
 def _get_current_tags(name, runas=None):
     """
-    Whether Rabbitmq user's tags need to be changed
+    Return the Rabbitmq user's current tags
     """
     try:
-        return list(__salt__["rabbitmq.list_users"](runas=runas)[name])
+        return list(_list_users(runas=runas).get(name, []))
     except CommandExecutionError as err:
         log.error("Error: %s", err)
         return []
@@ -98,15 +147,44 @@ def present(name, password=None, force=False, tags=None, perms=(), runas=None):
         Optional list of tags for the user
     perms
         A list of dicts with vhost keys and 3-tuple values
+
+        .. versionchanged:: 3008.0
+            The ``old`` permissions reported in ``changes["perms"]`` are now
+            keyed by vhost, like ``new``, instead of being a single flat
+            ``configure``/``write``/``read`` dict.
     runas
         Name of the user to run the command
+
+    .. note::
+        The output of ``rabbitmqctl list_users`` is cached in ``__context__``
+        for the rest of the state run and only refreshed after this state
+        module adds, deletes or re-tags a user. Tags changed by other means
+        during the same run, such as ``module.run`` or ``cmd.run``, are not
+        seen by later ``rabbitmq_user.present`` states. Permissions are always
+        read fresh.
     """
-    ret = {"name": name, "result": False, "comment": "", "changes": {}}
+    changes = {}
+    ret = {"name": name, "result": False, "comment": "", "changes": changes}
+
+    for vhost_perm in perms:
+        if not isinstance(vhost_perm, dict):
+            ret["comment"] = (
+                "Each perms entry must map a vhost to its configure, write and "
+                "read patterns."
+            )
+            return ret
+        for vhost, perm in vhost_perm.items():
+            if not isinstance(perm, (list, tuple)) or len(perm) != 3:
+                ret["comment"] = (
+                    f"Permissions for vhost '{vhost}' must be a list of "
+                    "configure, write and read patterns."
+                )
+                return ret
 
     try:
         user = __salt__["rabbitmq.user_exists"](name, runas=runas)
     except CommandExecutionError as err:
-        ret["comment"] = "Error: {}".format(err)
+        ret["comment"] = f"Error: {err}"
         return ret
 
     passwd_reqs_update = False
@@ -116,7 +194,7 @@ def present(name, password=None, force=False, tags=None, perms=(), runas=None):
                 passwd_reqs_update = True
                 log.debug("RabbitMQ user %s password update required", name)
         except CommandExecutionError as err:
-            ret["comment"] = "Error: {}".format(err)
+            ret["comment"] = f"Error: {err}"
             return ret
 
     if user and not any((force, perms, tags, passwd_reqs_update)):
@@ -124,22 +202,23 @@ def present(name, password=None, force=False, tags=None, perms=(), runas=None):
             "RabbitMQ user '%s' exists, password is up to date and force is not set.",
             name,
         )
-        ret["comment"] = "User '{}' is already present.".format(name)
+        ret["comment"] = f"User '{name}' is already present."
         ret["result"] = True
         return ret
 
     if not user:
-        ret["changes"].update({"user": {"old": "", "new": name}})
+        changes["user"] = {"old": "", "new": name}
         if __opts__["test"]:
             ret["result"] = None
-            ret["comment"] = "User '{}' is set to be created.".format(name)
+            ret["comment"] = f"User '{name}' is set to be created."
             return ret
 
         log.debug("RabbitMQ user '%s' doesn't exist - Creating.", name)
         try:
             __salt__["rabbitmq.add_user"](name, password, runas=runas)
+            _clear_cache()
         except CommandExecutionError as err:
-            ret["comment"] = "Error: {}".format(err)
+            ret["comment"] = f"Error: {err}"
             return ret
     else:
         log.debug("RabbitMQ user '%s' exists", name)
@@ -151,20 +230,18 @@ def present(name, password=None, force=False, tags=None, perms=(), runas=None):
                             name, password, runas=runas
                         )
                     except CommandExecutionError as err:
-                        ret["comment"] = "Error: {}".format(err)
+                        ret["comment"] = f"Error: {err}"
                         return ret
-                ret["changes"].update({"password": {"old": "", "new": "Set password."}})
+                changes["password"] = {"old": "", "new": "Set password."}
             else:
                 if not __opts__["test"]:
                     log.debug("Password for %s is not set - Clearing password.", name)
                     try:
                         __salt__["rabbitmq.clear_password"](name, runas=runas)
                     except CommandExecutionError as err:
-                        ret["comment"] = "Error: {}".format(err)
+                        ret["comment"] = f"Error: {err}"
                         return ret
-                ret["changes"].update(
-                    {"password": {"old": "Removed password.", "new": ""}}
-                )
+                changes["password"] = {"old": "Removed password.", "new": ""}
 
     if tags is not None:
         current_tags = _get_current_tags(name, runas=runas)
@@ -172,55 +249,63 @@ def present(name, password=None, force=False, tags=None, perms=(), runas=None):
             tags = tags.split()
         # Diff the tags sets. Symmetric difference operator ^ will give us
         # any element in one set, but not both
-        if set(tags) ^ set(current_tags):
+        if frozenset(tags) ^ frozenset(current_tags):
             if not __opts__["test"]:
                 try:
                     __salt__["rabbitmq.set_user_tags"](name, tags, runas=runas)
+                    _clear_cache()
                 except CommandExecutionError as err:
-                    ret["comment"] = "Error: {}".format(err)
+                    ret["comment"] = f"Error: {err}"
                     return ret
-            ret["changes"].update({"tags": {"old": current_tags, "new": tags}})
-    try:
-        existing_perms = __salt__["rabbitmq.list_user_permissions"](name, runas=runas)
-    except CommandExecutionError as err:
-        ret["comment"] = "Error: {}".format(err)
-        return ret
+            changes["tags"] = {"old": current_tags, "new": tags}
+    # Only ask rabbitmqctl for the current permissions when they are managed
+    existing_perms = {}
+    if perms:
+        try:
+            existing_perms = __salt__["rabbitmq.list_user_permissions"](
+                name, runas=runas
+            )
+        except CommandExecutionError as err:
+            ret["comment"] = f"Error: {err}"
+            return ret
 
     if _check_perms_changes(name, perms, runas=runas, existing=existing_perms):
-        for vhost_perm in perms:
-            for vhost, perm in vhost_perm.items():
-                if not __opts__["test"]:
-                    try:
-                        __salt__["rabbitmq.set_permissions"](
-                            vhost, name, perm[0], perm[1], perm[2], runas=runas
-                        )
-                    except CommandExecutionError as err:
-                        ret["comment"] = "Error: {}".format(err)
-                        return ret
-                new_perms = {
-                    vhost: {"configure": perm[0], "write": perm[1], "read": perm[2]}
-                }
-                if vhost in existing_perms:
-                    if existing_perms[vhost] != new_perms[vhost]:
-                        if ret["changes"].get("perms") is None:
-                            ret["changes"].update({"perms": {"old": {}, "new": {}}})
-                        ret["changes"]["perms"]["old"].update(existing_perms[vhost])
-                        ret["changes"]["perms"]["new"].update(new_perms)
-                else:
-                    ret["changes"].update({"perms": {"new": {}}})
-                    ret["changes"]["perms"]["new"].update(new_perms)
+        perms_to_set = [
+            (vhost, conf, write, read)
+            for vhost_perm in perms
+            for vhost, (conf, write, read) in vhost_perm.items()
+        ]
+        if not __opts__["test"]:
+            try:
+                _set_permissions(name, perms_to_set, runas=runas)
+            except CommandExecutionError as err:
+                ret["comment"] = f"Error: {err}"
+                return ret
+        perms_old = {}
+        perms_new = {}
+        for vhost, conf, write, read in perms_to_set:
+            new_perm = {"configure": conf, "write": write, "read": read}
+            if vhost not in existing_perms:
+                perms_new[vhost] = new_perm
+            elif existing_perms[vhost] != new_perm:
+                perms_old[vhost] = existing_perms[vhost]
+                perms_new[vhost] = new_perm
+        if perms_old:
+            changes["perms"] = {"old": perms_old, "new": perms_new}
+        elif perms_new:
+            changes["perms"] = {"new": perms_new}
 
     ret["result"] = True
-    if ret["changes"] == {}:
-        ret["comment"] = "'{}' is already in the desired state.".format(name)
+    if not changes:
+        ret["comment"] = f"'{name}' is already in the desired state."
         return ret
 
     if __opts__["test"]:
         ret["result"] = None
-        ret["comment"] = "Configuration for '{}' will change.".format(name)
+        ret["comment"] = f"Configuration for '{name}' will change."
         return ret
 
-    ret["comment"] = "'{}' was configured.".format(name)
+    ret["comment"] = f"'{name}' was configured."
     return ret
 
 
@@ -238,27 +323,28 @@ def absent(name, runas=None):
     try:
         user_exists = __salt__["rabbitmq.user_exists"](name, runas=runas)
     except CommandExecutionError as err:
-        ret["comment"] = "Error: {}".format(err)
+        ret["comment"] = f"Error: {err}"
         return ret
 
     if user_exists:
         if not __opts__["test"]:
             try:
                 __salt__["rabbitmq.delete_user"](name, runas=runas)
+                _clear_cache()
             except CommandExecutionError as err:
-                ret["comment"] = "Error: {}".format(err)
+                ret["comment"] = f"Error: {err}"
                 return ret
-        ret["changes"].update({"name": {"old": name, "new": ""}})
+        ret["changes"]["name"] = {"old": name, "new": ""}
     else:
         ret["result"] = True
-        ret["comment"] = "The user '{}' is not present.".format(name)
+        ret["comment"] = f"The user '{name}' is not present."
         return ret
 
     if __opts__["test"] and ret["changes"]:
         ret["result"] = None
-        ret["comment"] = "The user '{}' will be removed.".format(name)
+        ret["comment"] = f"The user '{name}' will be removed."
         return ret
 
     ret["result"] = True
-    ret["comment"] = "The user '{}' was removed.".format(name)
+    ret["comment"] = f"The user '{name}' was removed."
     return ret
@@ -4,16 +4,9 @@ Test the core grains
 import pytest
 
 import salt.loader
-import salt.utils.platform
 from tests.support.case import ModuleCase
 from tests.support.mixins import LoaderModuleMockMixin
 
-if salt.utils.platform.is_windows():
-    try:
-        import salt.modules.reg
-    except ImportError:
-        pass
-
 
 @pytest.mark.windows_whitelisted
 class TestGrainsCore(ModuleCase):
@@ -36,24 +29,26 @@ class TestGrainsCore(ModuleCase):
         """
         test grains['swap_total']
         """
-        swapmem = self.run_function("cmd.run", ["swapctl -sk"]).split(" ")[1]
+        swapmem = self.run_function("cmd.run", ["swapctl -sk"]).split()[1]
         self.assertEqual(
             self.run_function("grains.items")["swap_total"], int(swapmem) // 1048576
         )
 
 
 @pytest.mark.windows_whitelisted
+@pytest.mark.skip_unless_on_windows
 class TestGrainsReg(ModuleCase, LoaderModuleMockMixin):
     """
     Test the core windows grains
     """
 
     def setup_loader_modules(self):
+        import salt.modules.reg
+
         self.opts = opts = salt.config.DEFAULT_MINION_OPTS.copy()
         utils = salt.loader.utils(opts, whitelist=["reg"])
         return {salt.modules.reg: {"__opts__": opts, "__utils__": utils}}
 
-    @pytest.mark.skip_unless_on_windows
     @pytest.mark.slow_test
     def test_win_cpu_model(self):
         """
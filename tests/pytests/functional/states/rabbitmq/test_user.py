@@ -33,6 +33,7 @@ def configure_loader_modules(docker_cmd_run_all_wrapper, docker_cmd_run_wrapper)
                 "rabbitmq.list_users": rabbitmq.list_users,
                 "rabbitmq.set_user_tags": rabbitmq.set_user_tags,
                 "rabbitmq.set_permissions": rabbitmq.set_permissions,
+                "rabbitmq.set_permissions_bulk": rabbitmq.set_permissions_bulk,
                 "rabbitmq.check_password": rabbitmq.check_password,
                 "rabbitmq.change_password": rabbitmq.change_password,
                 "cmd.run": docker_cmd_run_wrapper,
@@ -119,7 +120,7 @@ def test_present_absent(docker_cmd_run_all_wrapper, rabbitmq_container):
         "changes": {
             "password": {"old": "", "new": "Set password."},
             "perms": {
-                "old": {"configure": ".*", "write": ".*", "read": "test$"},
+                "old": {"/": {"configure": ".*", "write": ".*", "read": "test$"}},
                 "new": {"/": {"configure": "", "write": "", "read": ".*"}},
             },
         },
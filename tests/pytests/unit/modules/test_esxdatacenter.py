@@ -15,6 +15,14 @@ def configure_loader_modules():
     return {esxdatacenter: {"__proxy__": {}}}
 
 
+def test_virtual_not_proxy():
+    with patch("salt.utils.platform.is_proxy", MagicMock(return_value=False)):
+        assert esxdatacenter.__virtual__() == (
+            False,
+            "Must be run on a proxy minion",
+        )
+
+
 def test_get_details():
     mock_get_details = MagicMock()
     with patch.dict(
@@ -330,6 +330,32 @@ def test_set_permissions():
         }
 
 
+# 'set_permissions_bulk' function tests: 1
+def test_set_permissions_bulk():
+    """
+    Test if it sets permissions for several vhosts with a single
+    rabbitmqctl eval call.
+    """
+    mock_run = MagicMock(return_value={"retcode": 0, "stdout": "ok", "stderr": ""})
+    with patch.dict(rabbitmq.__salt__, {"cmd.run_all": mock_run}):
+        assert rabbitmq.set_permissions_bulk(
+            "myuser",
+            [("/", ".*", ".*", ".*"), ("myvhost", "", 'a"b', "c\\d")],
+            runas="rabbitmq",
+        ) == {"Permissions Set": "ok"}
+    mock_run.assert_called_once()
+    cmd = mock_run.call_args[0][0]
+    assert cmd[1] == "eval"
+    assert cmd[2] == (
+        "lists:foreach(fun({V, C, W, R}) -> "
+        "rabbit_auth_backend_internal:set_permissions"
+        '(<<"myuser"/utf8>>, V, C, W, R, <<"rmq-cli">>) end, ['
+        '{<<"/"/utf8>>, <<".*"/utf8>>, <<".*"/utf8>>, <<".*"/utf8>>}, '
+        '{<<"myvhost"/utf8>>, <<""/utf8>>, <<"a\\"b"/utf8>>, <<"c\\\\d"/utf8>>}'
+        "])."
+    )
+
+
 # 'list_permissions' function tests: 1
 def test_list_permissions():
     """
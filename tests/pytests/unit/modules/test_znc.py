@@ -4,10 +4,13 @@
     TestCase for salt.modules.znc
 """
 
+import hashlib
+import sys
 
 import pytest
 
 import salt.modules.znc as znc
+from salt.exceptions import CommandExecutionError
 from tests.support.mock import MagicMock, patch
 
 
@@ -16,6 +19,73 @@ def configure_loader_modules():
     return {znc: {}}
 
 
+# '__virtual__' function tests: 1
+
+
+def test_virtual_binary_missing():
+    """
+    Tests that the module does not load without the znc binary
+    """
+    with patch("salt.utils.path.which", MagicMock(return_value=None)):
+        assert znc.__virtual__() == (False, "Module znc: znc binary not found")
+
+
+# '_makepass' function tests: 4
+
+
+@pytest.mark.parametrize("hasher", ["sha256", "md5"])
+def test_makepass(hasher):
+    """
+    Tests creating a znc compatible hashed password
+    """
+    ret = znc._makepass("password", hasher=hasher)
+    assert ret["Method"] == hasher
+    assert len(ret["Salt"]) == 20
+    assert (
+        ret["Hash"]
+        == hashlib.new(hasher, ("password" + ret["Salt"]).encode()).hexdigest()
+    )
+
+
+def test_makepass_unsupported_hasher():
+    """
+    Tests that an unsupported hasher is rejected
+    """
+    assert znc._makepass("password", hasher="sha1") is NotImplemented
+
+
+def test_makepass_argon2id():
+    """
+    Tests creating an Argon2id hashed password
+    """
+    mock_hasher = MagicMock()
+    mock_hasher.return_value.hash.return_value = "$argon2id$v=19$m=6144,t=6,p=1$x"
+    mock_argon2 = MagicMock(PasswordHasher=mock_hasher)
+    with patch.dict(sys.modules, {"argon2": mock_argon2}):
+        assert znc._makepass("password", hasher="Argon2id") == {
+            "Method": "Argon2id",
+            "Salt": "",
+            "Hash": "$argon2id$v=19$m=6144,t=6,p=1$x",
+        }
+    mock_hasher.assert_called_once_with(
+        time_cost=6,
+        memory_cost=6144,
+        parallelism=1,
+        hash_len=32,
+        type=mock_argon2.Type.ID,
+    )
+    mock_hasher.return_value.hash.assert_called_once_with("password")
+
+
+def test_makepass_argon2id_missing_library():
+    """
+    Tests the Argon2id hasher without the argon2-cffi library installed
+    """
+    with patch.dict(sys.modules, {"argon2": None}):
+        with pytest.raises(CommandExecutionError):
+            znc._makepass("password", hasher="Argon2id")
+
+
 # 'buildmod' function tests: 1
 
 
@@ -76,6 +146,8 @@ def test_version():
     """
     Tests return server version from znc --version
     """
-    mock = MagicMock(return_value="ZNC 1.2 - http://znc.in")
+    mock = MagicMock(return_value="ZNC 1.2 - http://znc.in\nIPv6: yes")
     with patch.dict(znc.__salt__, {"cmd.run": mock}):
         assert znc.version() == "ZNC 1.2"
+        assert znc.version() == "ZNC 1.2"
+        mock.assert_called_once()
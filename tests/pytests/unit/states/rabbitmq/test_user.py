@@ -0,0 +1,410 @@
+"""
+Test cases for salt.states.rabbitmq_user
+"""
+
+import pytest
+
+import salt.states.rabbitmq_user as rabbitmq_user
+from salt.exceptions import CommandExecutionError
+from tests.support.mock import MagicMock, call, patch
+
+
+@pytest.fixture
+def configure_loader_modules():
+    return {rabbitmq_user: {"__opts__": {"test": False}, "__context__": {}}}
+
+
+# '__virtual__' function tests: 1
+
+
+def test_virtual_rabbitmqctl_missing():
+    """
+    Test that the state does not load without rabbitmqctl.
+    """
+    with patch("salt.utils.path.which", MagicMock(return_value=None)):
+        assert rabbitmq_user.__virtual__() == (
+            False,
+            "Command not found: rabbitmqctl",
+        )
+
+
+# '_check_perms_changes' function tests: 1
+
+
+@pytest.mark.parametrize(
+    "newperms,expected",
+    [
+        ([], False),
+        ([{"/": [".*", ".*", ".*"]}], False),
+        ([{"/": ["", ".*", ".*"]}], True),
+        ([{"/": [".*", ".*", ".*"]}, {"other": [".*", ".*", ".*"]}], True),
+        ([{"empty": ["", "", ""]}], False),
+        ([{"empty": ["", "", ".*"]}], True),
+    ],
+)
+def test_check_perms_changes(newperms, expected):
+    """
+    Test whether a RabbitMQ user's permissions need to be changed.
+    """
+    existing = {
+        "/": {"configure": ".*", "write": ".*", "read": ".*"},
+        "empty": {"configure": "", "write": "", "read": ""},
+    }
+    assert (
+        rabbitmq_user._check_perms_changes("foo", newperms, existing=existing)
+        is expected
+    )
+
+
+# 'present' function tests: 11
+
+
+def test_present_user_missing():
+    """
+    Test to ensure a missing RabbitMQ user is created.
+    """
+    name = "foo"
+
+    ret = {
+        "name": name,
+        "changes": {"user": {"old": "", "new": name}},
+        "result": True,
+        "comment": f"'{name}' was configured.",
+    }
+
+    mock_add = MagicMock(return_value={"Added": name})
+    with patch.dict(
+        rabbitmq_user.__salt__,
+        {
+            "rabbitmq.user_exists": MagicMock(return_value=False),
+            "rabbitmq.add_user": mock_add,
+        },
+    ):
+        assert rabbitmq_user.present(name, password="password") == ret
+        mock_add.assert_called_once_with(name, "password", runas=None)
+
+
+def test_present_user_missing_test_mode():
+    """
+    Test that test mode reports a missing user without querying rabbitmqctl
+    for tags or permissions.
+    """
+    name = "foo"
+
+    ret = {
+        "name": name,
+        "changes": {"user": {"old": "", "new": name}},
+        "result": None,
+        "comment": f"User '{name}' is set to be created.",
+    }
+
+    mock_users = MagicMock()
+    mock_perms = MagicMock()
+    with patch.dict(
+        rabbitmq_user.__salt__,
+        {
+            "rabbitmq.user_exists": MagicMock(return_value=False),
+            "rabbitmq.list_users": mock_users,
+            "rabbitmq.list_user_permissions": mock_perms,
+        },
+    ), patch.dict(rabbitmq_user.__opts__, {"test": True}):
+        assert (
+            rabbitmq_user.present(
+                name, tags=["monitoring"], perms=[{"/": [".*", ".*", ".*"]}]
+            )
+            == ret
+        )
+        mock_users.assert_not_called()
+        mock_perms.assert_not_called()
+
+
+_VHOST_PERM_ERROR = (
+    "Permissions for vhost '/' must be a list of configure, write and read " "patterns."
+)
+
+
+@pytest.mark.parametrize(
+    "perms,comment",
+    [
+        ([{"/": [".*", ".*"]}], _VHOST_PERM_ERROR),
+        ([{"/": [".*", ".*", ".*", ".*"]}], _VHOST_PERM_ERROR),
+        ([{"/": ".*"}], _VHOST_PERM_ERROR),
+        (
+            ["/"],
+            "Each perms entry must map a vhost to its configure, write and "
+            "read patterns.",
+        ),
+    ],
+)
+def test_present_invalid_perms(perms, comment):
+    """
+    Test that malformed permissions are rejected before rabbitmqctl is
+    called.
+    """
+    name = "foo"
+
+    ret = {
+        "name": name,
+        "changes": {},
+        "result": False,
+        "comment": comment,
+    }
+
+    mock_exists = MagicMock(return_value=True)
+    with patch.dict(rabbitmq_user.__salt__, {"rabbitmq.user_exists": mock_exists}):
+        assert rabbitmq_user.present(name, perms=perms) == ret
+        mock_exists.assert_not_called()
+
+
+def test_present_perms_listed_once():
+    """
+    Test that the user's permissions are only queried once.
+    """
+    name = "foo"
+    perms = [{"/": [".*", ".*", ".*"]}]
+
+    ret = {
+        "name": name,
+        "changes": {},
+        "result": True,
+        "comment": f"'{name}' is already in the desired state.",
+    }
+
+    mock_list = MagicMock(
+        return_value={"/": {"configure": ".*", "write": ".*", "read": ".*"}}
+    )
+    with patch.dict(
+        rabbitmq_user.__salt__,
+        {
+            "rabbitmq.user_exists": MagicMock(return_value=True),
+            "rabbitmq.list_user_permissions": mock_list,
+        },
+    ):
+        assert rabbitmq_user.present(name, perms=perms) == ret
+        mock_list.assert_called_once_with(name, runas=None)
+
+
+def test_present_perms_set_in_bulk():
+    """
+    Test that changed permissions are set with a single bulk call.
+    """
+    name = "foo"
+    perms = [{"/": [".*", ".*", ".*"]}, {"other": ["", "", ".*"]}]
+
+    ret = {
+        "name": name,
+        "changes": {
+            "perms": {
+                "new": {"other": {"configure": "", "write": "", "read": ".*"}},
+            }
+        },
+        "result": True,
+        "comment": f"'{name}' was configured.",
+    }
+
+    mock_bulk = MagicMock(return_value={"Permissions Set": "ok"})
+    with patch.dict(
+        rabbitmq_user.__salt__,
+        {
+            "rabbitmq.user_exists": MagicMock(return_value=True),
+            "rabbitmq.list_user_permissions": MagicMock(
+                return_value={"/": {"configure": ".*", "write": ".*", "read": ".*"}}
+            ),
+            "rabbitmq.set_permissions_bulk": mock_bulk,
+        },
+    ):
+        assert rabbitmq_user.present(name, perms=perms) == ret
+        mock_bulk.assert_called_once_with(
+            name, [("/", ".*", ".*", ".*"), ("other", "", "", ".*")], runas=None
+        )
+
+
+def test_present_perms_bulk_fallback():
+    """
+    Test that permissions are set per vhost when the bulk call fails.
+    """
+    name = "foo"
+    perms = [{"/": ["", "", ".*"]}, {"other": ["", "", ".*"]}]
+
+    mock_bulk = MagicMock(side_effect=CommandExecutionError("eval not allowed"))
+    mock_set = MagicMock(return_value={"Permissions Set": "ok"})
+    with patch.dict(
+        rabbitmq_user.__salt__,
+        {
+            "rabbitmq.user_exists": MagicMock(return_value=True),
+            "rabbitmq.list_user_permissions": MagicMock(return_value={}),
+            "rabbitmq.set_permissions_bulk": mock_bulk,
+            "rabbitmq.set_permissions": mock_set,
+        },
+    ):
+        ret = rabbitmq_user.present(name, perms=perms)
+        assert ret["result"] is True
+        assert ret["comment"] == f"'{name}' was configured."
+        mock_bulk.assert_called_once()
+        assert mock_set.call_args_list == [
+            call("/", name, "", "", ".*", runas=None),
+            call("other", name, "", "", ".*", runas=None),
+        ]
+
+
+def test_present_perms_bulk_tried_once():
+    """
+    Test that a failed bulk call is not retried for later users in the run.
+    """
+    perms = [{"/": ["", "", ".*"]}]
+
+    mock_bulk = MagicMock(side_effect=CommandExecutionError("eval not allowed"))
+    mock_set = MagicMock(return_value={"Permissions Set": "ok"})
+    with patch.dict(
+        rabbitmq_user.__salt__,
+        {
+            "rabbitmq.user_exists": MagicMock(return_value=True),
+            "rabbitmq.list_user_permissions": MagicMock(return_value={}),
+            "rabbitmq.set_permissions_bulk": mock_bulk,
+            "rabbitmq.set_permissions": mock_set,
+        },
+    ):
+        for name in ("foo", "bar"):
+            assert rabbitmq_user.present(name, perms=perms)["result"] is True
+        mock_bulk.assert_called_once()
+        assert mock_set.call_args_list == [
+            call("/", "foo", "", "", ".*", runas=None),
+            call("/", "bar", "", "", ".*", runas=None),
+        ]
+
+
+def test_present_perms_windows():
+    """
+    Test that permissions are set per vhost on Windows without trying the
+    bulk call.
+    """
+    name = "foo"
+    perms = [{"/": ["", "", ".*"]}, {"other": ["", "", ".*"]}]
+
+    mock_bulk = MagicMock()
+    mock_set = MagicMock(return_value={"Permissions Set": "ok"})
+    with patch.dict(
+        rabbitmq_user.__salt__,
+        {
+            "rabbitmq.user_exists": MagicMock(return_value=True),
+            "rabbitmq.list_user_permissions": MagicMock(return_value={}),
+            "rabbitmq.set_permissions_bulk": mock_bulk,
+            "rabbitmq.set_permissions": mock_set,
+        },
+    ), patch("salt.utils.platform.is_windows", MagicMock(return_value=True)):
+        ret = rabbitmq_user.present(name, perms=perms)
+        assert ret["result"] is True
+        mock_bulk.assert_not_called()
+        assert mock_set.call_args_list == [
+            call("/", name, "", "", ".*", runas=None),
+            call("other", name, "", "", ".*", runas=None),
+        ]
+
+
+def test_present_tags_string():
+    """
+    Test that tags given as a string are split before being compared.
+    """
+    name = "foo"
+
+    ret = {
+        "name": name,
+        "changes": {"tags": {"old": ["monitoring"], "new": ["monitoring", "user"]}},
+        "result": True,
+        "comment": f"'{name}' was configured.",
+    }
+
+    mock_tags = MagicMock(return_value={"Tag(s) set": "ok"})
+    with patch.dict(
+        rabbitmq_user.__salt__,
+        {
+            "rabbitmq.user_exists": MagicMock(return_value=True),
+            "rabbitmq.list_users": MagicMock(return_value={name: ["monitoring"]}),
+            "rabbitmq.set_user_tags": mock_tags,
+        },
+    ):
+        assert rabbitmq_user.present(name, tags="monitoring user") == ret
+        mock_tags.assert_called_once_with(name, ["monitoring", "user"], runas=None)
+
+
+def test_present_listings_cached():
+    """
+    Test that the rabbitmqctl user listing is cached in __context__ and
+    dropped once a user is changed, while permissions are always read fresh.
+    """
+    mock_users = MagicMock(return_value={"foo": ["monitoring"], "bar": ["monitoring"]})
+    mock_perms = MagicMock(
+        return_value={"/": {"configure": ".*", "write": ".*", "read": ".*"}}
+    )
+    with patch.dict(
+        rabbitmq_user.__salt__,
+        {
+            "rabbitmq.user_exists": MagicMock(return_value=True),
+            "rabbitmq.list_users": mock_users,
+            "rabbitmq.list_user_permissions": mock_perms,
+            "rabbitmq.set_user_tags": MagicMock(return_value={"Tag(s) set": "ok"}),
+        },
+    ):
+        for name in ("foo", "bar"):
+            ret = rabbitmq_user.present(
+                name, tags=["monitoring"], perms=[{"/": [".*", ".*", ".*"]}]
+            )
+            assert ret["result"] is True
+            assert ret["changes"] == {}
+        mock_users.assert_called_once_with(runas=None)
+        assert mock_perms.call_count == 2
+
+        # Permissions for a user already handled are not served from a cache
+        rabbitmq_user.present("foo", perms=[{"/": [".*", ".*", ".*"]}])
+        assert mock_perms.call_count == 3
+
+        # Changing the tags drops the cached listing
+        rabbitmq_user.present("foo", tags=["administrator"])
+        rabbitmq_user.present("bar", tags=["monitoring"])
+        assert mock_users.call_count == 2
+
+
+def test_present_perms_changed_and_new_vhost():
+    """
+    Test that changes to existing and new vhosts are all reported, keyed
+    by vhost.
+    """
+    name = "foo"
+    perms = [
+        {"/": ["", "", ".*"]},
+        {"logs": ["", ".*", ""]},
+        {"other": [".*", ".*", ".*"]},
+    ]
+
+    ret = {
+        "name": name,
+        "changes": {
+            "perms": {
+                "old": {
+                    "/": {"configure": ".*", "write": ".*", "read": ".*"},
+                    "logs": {"configure": "", "write": "", "read": ".*"},
+                },
+                "new": {
+                    "/": {"configure": "", "write": "", "read": ".*"},
+                    "logs": {"configure": "", "write": ".*", "read": ""},
+                    "other": {"configure": ".*", "write": ".*", "read": ".*"},
+                },
+            }
+        },
+        "result": None,
+        "comment": f"Configuration for '{name}' will change.",
+    }
+
+    with patch.dict(
+        rabbitmq_user.__salt__,
+        {
+            "rabbitmq.user_exists": MagicMock(return_value=True),
+            "rabbitmq.list_user_permissions": MagicMock(
+                return_value={
+                    "/": {"configure": ".*", "write": ".*", "read": ".*"},
+                    "logs": {"configure": "", "write": "", "read": ".*"},
+                }
+            ),
+        },
+    ), patch.dict(rabbitmq_user.__opts__, {"test": True}):
+        assert rabbitmq_user.present(name, perms=perms) == ret
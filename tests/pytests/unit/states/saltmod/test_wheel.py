@@ -14,6 +14,13 @@ def configure_loader_modules(minion_opts):
     }
 
 
+@pytest.fixture
+def wheel_mock():
+    mock = MagicMock(return_value={"return": True})
+    with patch.dict(saltmod.__salt__, {"saltutil.wheel": mock}):
+        yield mock
+
+
 def test_test_mode():
     name = "bah"
 
@@ -29,23 +36,20 @@ def test_test_mode():
         assert ret == expected
 
 
-def test_wheel():
+@pytest.mark.parametrize("name", ["state", "key.list_all"])
+def test_wheel(wheel_mock, name):
     """
     Test to execute a wheel module on the master
     """
-    name = "state"
-
     expected = {
         "changes": {"return": True},
-        "name": "state",
+        "name": name,
         "result": True,
-        "comment": "Wheel function 'state' executed.",
+        "comment": f"Wheel function '{name}' executed.",
     }
-    with patch.dict(
-        saltmod.__salt__, {"saltutil.wheel": MagicMock(return_value={"return": True})}
-    ):
-        ret = saltmod.wheel(name)
-        assert ret == expected
+    ret = saltmod.wheel(name)
+    assert ret == expected
+    wheel_mock.assert_called_once()
 
 
 def test_test_error_in_return():